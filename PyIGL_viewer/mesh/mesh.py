@@ -7,6 +7,21 @@ import datetime
 import uuid
 
 
+# OpenGL component type and normalization flag of the attribute arrays, by NumPy dtype.
+# Integer arrays are read as normalized fixed-point values (SNORM/UNORM), e.g. int8 normals in [-127, 127].
+# Any other dtype is bound as float.
+ATTRIBUTE_GL_TYPES = {
+    np.dtype(np.int8): (gl.GL_BYTE, True),
+    np.dtype(np.uint8): (gl.GL_UNSIGNED_BYTE, True),
+    np.dtype(np.int16): (gl.GL_SHORT, True),
+    np.dtype(np.uint16): (gl.GL_UNSIGNED_SHORT, True),
+}
+
+def attribute_buffer(value):
+    gl_type, normalized = ATTRIBUTE_GL_TYPES.get(value.dtype, (gl.GL_FLOAT, False))
+    return (gl.arrays.vbo.VBO(value), value.shape[1], gl_type, normalized)
+
+
 #################################################################################################
 # A mesh core contains the vertex positions and the topology of the triangle mesh.
 
@@ -34,8 +49,8 @@ class GlMeshCore:
             self.element_size *= 2
 
         self.elements = faces.reshape((-1,))
-        flat_vertices = self.flatten_vertex_attribute(vertices)
-        self.flat_vertex_buffer = gl.arrays.vbo.VBO(flat_vertices)
+        self.flat_vertices = self.flatten_vertex_attribute(vertices)
+        self.flat_vertex_buffer = gl.arrays.vbo.VBO(self.flat_vertices)
 
     def flatten_vertex_attribute(self, attribute):
         flat_attribute = attribute[self.elements]
@@ -51,8 +66,11 @@ class GlMeshCore:
         gl.glVertexAttribPointer(0, 3, gl.GL_FLOAT, False, 0, None)
 
     def update_vertices(self, vertices):
-        flat_vertices = self.flatten_vertex_attribute(vertices)
-        self.flat_vertex_buffer.set_array(flat_vertices)
+        # Gather into the existing array and overwrite the GL buffer in place instead of reallocating it.
+        np.take(vertices, self.elements, axis=0, out=self.flat_vertices)
+        self.flat_vertex_buffer.bind()
+        gl.glBufferSubData(gl.GL_ARRAY_BUFFER, 0, self.flat_vertices.nbytes, self.flat_vertices)
+        self.flat_vertex_buffer.unbind()
 
 #################################################################################################
         
@@ -80,7 +98,7 @@ class GlMeshPrefab:
                 else:
                     raise ValueError(f'Attribute {attribute} missing from mesh prefab data')
             else:
-                self.vertex_buffers[attribute] = (gl.arrays.vbo.VBO(attributes[attribute]), attributes[attribute].shape[1])
+                self.vertex_buffers[attribute] = attribute_buffer(attributes[attribute])
 
         self.uniform_values = {}
         for uniform in self.shader.uniforms:
@@ -99,10 +117,9 @@ class GlMeshPrefab:
         for attribute in self.vertex_buffers:
             attribute_location = self.shader.attributes[attribute]
             gl.glEnableVertexAttribArray(attribute_location)
-            attribute_buffer = self.vertex_buffers[attribute][0]
-            attribute_size = self.vertex_buffers[attribute][1]
-            attribute_buffer.bind()
-            gl.glVertexAttribPointer(attribute_location, attribute_size, gl.GL_FLOAT, False, 0, None)
+            buffer, size, gl_type, normalized = self.vertex_buffers[attribute]
+            buffer.bind()
+            gl.glVertexAttribPointer(attribute_location, size, gl_type, normalized, 0, None)
 
     def bind_uniform_(self, location, value):
         shape = value.shape
@@ -133,7 +150,7 @@ class GlMeshPrefab:
         self.uniform_values[name] = value
 
     def update_attribute(self, name, value):
-        self.vertex_buffers[name] = (gl.arrays.vbo.VBO(value), value.shape[1])
+        self.vertex_buffers[name] = attribute_buffer(value)
 
 #################################################################################################
 
@@ -3,9 +3,17 @@
 in vec4 outNormal;
 
 uniform vec3 albedo;
-uniform vec3 lightDirection;
-uniform vec3 lightIntensity;
-uniform vec3 ambientLighting;
+
+layout(std140) uniform Globals
+{
+    mat4 view;
+    mat4 projection;
+    vec3 lightDirection;
+    vec3 lightIntensity;
+    vec3 ambientLighting;
+    vec3 cameraPosition;
+    bool linkLight;
+};
 
 out vec4 outputColor;
 void main()
@@ -0,0 +1,36 @@
+#version 330
+
+in vec4 outNormal;
+in vec3 barycentric;
+
+uniform vec3 albedo;
+uniform vec3 lineColor;
+uniform bool drawWireframe;
+
+layout(std140) uniform Globals
+{
+    mat4 view;
+    mat4 projection;
+    vec3 lightDirection;
+    vec3 lightIntensity;
+    vec3 ambientLighting;
+    vec3 cameraPosition;
+    bool linkLight;
+};
+
+out vec4 outputColor;
+void main()
+{
+    float dot_normal = abs(dot(outNormal.xyz, -lightDirection));
+    vec3 color = ambientLighting;
+    color += dot_normal * lightIntensity;
+    color *= albedo;
+
+    // Blend towards the line color within about one pixel of the triangle edges.
+    if (drawWireframe) {
+        vec3 edgeDistance = smoothstep(vec3(0.0), fwidth(barycentric), barycentric);
+        float edgeFactor = min(min(edgeDistance.x, edgeDistance.y), edgeDistance.z);
+        color = mix(lineColor, color, edgeFactor);
+    }
+    outputColor = vec4(color, 1.0f);
+}
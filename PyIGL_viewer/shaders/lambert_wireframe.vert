@@ -0,0 +1,37 @@
+#version 330
+layout(location = 0) in vec4 position;
+in vec4 normal;
+
+layout(std140) uniform Globals
+{
+    mat4 view;
+    mat4 projection;
+    vec3 lightDirection;
+    vec3 lightIntensity;
+    vec3 ambientLighting;
+    vec3 cameraPosition;
+    bool linkLight;
+};
+
+uniform mat4 model;
+
+uniform mat4 mvp;
+
+out vec4 outNormal;
+out vec3 barycentric;
+
+void main()
+{
+    outNormal = normal;
+    outNormal.w = 0.0;
+    outNormal = model * outNormal;
+    if (linkLight) {
+        outNormal = view * outNormal;
+    }
+    outNormal = normalize(outNormal);
+    gl_Position = mvp * position;
+
+    // Triangles are drawn from flattened vertex arrays, so the corner index is given by the vertex id.
+    int corner = gl_VertexID % 3;
+    barycentric = vec3(corner == 0, corner == 1, corner == 2);
+}
@@ -5,10 +5,16 @@ in vec4 outNormal;
 in vec4 worldPosition;
 in vec3 transformedLightDirection;
 
-uniform vec3 cameraPosition;
-
-uniform vec3 lightIntensity;
-uniform vec3 ambientLighting;
+layout(std140) uniform Globals
+{
+    mat4 view;
+    mat4 projection;
+    vec3 lightDirection;
+    vec3 lightIntensity;
+    vec3 ambientLighting;
+    vec3 cameraPosition;
+    bool linkLight;
+};
 
 uniform vec3 k_specular;
 uniform vec3 k_diffuse;
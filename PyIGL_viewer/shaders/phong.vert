@@ -3,15 +3,21 @@
 layout(location = 0) in vec4 position;
 in vec4 normal;
 
-uniform mat4 projection;
-uniform mat4 view;
+layout(std140) uniform Globals
+{
+    mat4 view;
+    mat4 projection;
+    vec3 lightDirection;
+    vec3 lightIntensity;
+    vec3 ambientLighting;
+    vec3 cameraPosition;
+    bool linkLight;
+};
+
 uniform mat4 model;
 
 uniform mat4 mvp;
 
-uniform bool linkLight;
-uniform vec3 lightDirection;
-
 out vec4 outNormal;
 out vec4 worldPosition;
 out vec3 transformedLightDirection;
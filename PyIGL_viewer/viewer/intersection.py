@@ -0,0 +1,185 @@
+import numpy as np
+
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+
+
+if njit is not None:
+
+    @njit(cache=True, parallel=True, fastmath=True)
+    def _intersect_tris(rs, re, V, F, out):
+        dx = re[0] - rs[0]
+        dy = re[1] - rs[1]
+        dz = re[2] - rs[2]
+        for i in prange(F.shape[0]):
+            a = F[i, 0]
+            b = F[i, 1]
+            c = F[i, 2]
+            ax = V[a, 0]
+            ay = V[a, 1]
+            az = V[a, 2]
+            e1x = V[b, 0] - ax
+            e1y = V[b, 1] - ay
+            e1z = V[b, 2] - az
+            e2x = V[c, 0] - ax
+            e2y = V[c, 1] - ay
+            e2z = V[c, 2] - az
+
+            nx = e1y * e2z - e1z * e2y
+            ny = e1z * e2x - e1x * e2z
+            nz = e1x * e2y - e1y * e2x
+            det = -(dx * nx + dy * ny + dz * nz)
+            out[i] = False
+            if det < 1e-6:
+                continue
+            inv_det = 1.0 / det
+
+            aox = rs[0] - ax
+            aoy = rs[1] - ay
+            aoz = rs[2] - az
+            daox = aoy * dz - aoz * dy
+            daoy = aoz * dx - aox * dz
+            daoz = aox * dy - aoy * dx
+            u = (e2x * daox + e2y * daoy + e2z * daoz) * inv_det
+            v = -(e1x * daox + e1y * daoy + e1z * daoz) * inv_det
+            t = (aox * nx + aoy * ny + aoz * nz) * inv_det
+            out[i] = (t >= 0) and (u >= 0) and (v >= 0) and (u + v <= 1)
+
+else:
+    _intersect_tris = None
+
+# Whether intersect_triangles runs the compiled kernel rather than the NumPy fallback.
+HAS_COMPILED_INTERSECTION = _intersect_tris is not None
+
+
+def _cross3(a, b):
+    # Open-coded cross product of 3-vectors, much cheaper than np.cross. Broadcasts like np.cross.
+    return np.stack(
+        (
+            a[..., 1] * b[..., 2] - a[..., 2] * b[..., 1],
+            a[..., 2] * b[..., 0] - a[..., 0] * b[..., 2],
+            a[..., 0] * b[..., 1] - a[..., 1] * b[..., 0],
+        ),
+        axis=-1,
+    )
+
+
+def intersect_triangles(ray_start, ray_end, vertices, faces, out=None):
+    """
+    Möller–Trumbore intersection of the segment [ray_start, ray_end] with every triangle.
+    See https://stackoverflow.com/questions/42740765/intersection-between-line-and-triangle-in-3d
+
+    :param ray_start: (3,) start of the ray.
+    :param ray_end: (3,) end of the ray.
+    :param vertices: (N, 3) vertex positions.
+    :param faces: (F, K) face indices, faces with more than 3 corners are tested as triangle fans.
+    :param out: optional (F,) boolean buffer reused across calls.
+    :return: (F,) boolean mask of the intersected faces.
+    """
+    if out is None or out.shape[0] != faces.shape[0]:
+        out = np.empty((faces.shape[0],), dtype=np.bool_)
+
+    # Points and edges cannot be hit by the ray.
+    if faces.shape[1] < 3:
+        out[:] = False
+        return out
+
+    # Polygons such as quads are split into a fan of triangles, the face is hit when any of its triangles is.
+    if faces.shape[1] > 3:
+        out[:] = False
+        fan_hits = np.empty_like(out)
+        for k in range(1, faces.shape[1] - 1):
+            intersect_triangles(ray_start, ray_end, vertices, faces[:, [0, k, k + 1]], out=fan_hits)
+            out |= fan_hits
+        return out
+
+    if _intersect_tris is not None:
+        _intersect_tris(ray_start, ray_end, vertices, faces, out)
+        return out
+
+    A = vertices[faces[:, 0]]
+    E1 = vertices[faces[:, 1]] - A
+    E2 = vertices[faces[:, 2]] - A
+    D = ray_end - ray_start
+
+    N = _cross3(E1, E2)
+    det = -np.einsum("j,ij->i", D, N)
+    valid_mask = det >= 1e-6
+    out[:] = False
+    if np.any(valid_mask):
+        A, E1, E2, N = A[valid_mask], E1[valid_mask], E2[valid_mask], N[valid_mask]
+        AO = ray_start - A
+        inv_det = 1 / det[valid_mask]
+        DAO = _cross3(AO, D)
+        u = np.einsum("ij,ij->i", E2, DAO) * inv_det
+        v = -np.einsum("ij,ij->i", E1, DAO) * inv_det
+        t = np.einsum("ij,ij->i", AO, N) * inv_det
+
+        out[valid_mask] = (t >= 0) & (u >= 0) & (v >= 0) & (u + v <= 1)
+
+    return out
+
+
+class TriangleGrid:
+    """
+    Uniform screen-space grid binning triangles by their 2D bounding box.
+    A ray cast along the view direction from a pixel can only hit the triangles of that pixel's cell.
+    Faces covering more than max_cells_per_face cells, e.g. close to the camera, are kept in a list tested for every
+    query instead, which bounds the memory of the grid.
+    """
+
+    def __init__(self, points, faces, width, height, max_resolution=256, max_cells_per_face=64):
+        tri = points[faces]
+        tri_min = tri.min(axis=1)
+        tri_max = tri.max(axis=1)
+        size = np.array([width, height])
+        inside = (
+            np.all(np.isfinite(tri_min) & np.isfinite(tri_max), axis=1)
+            & np.all(tri_max >= 0, axis=1)
+            & np.all(tri_min <= size, axis=1)
+        )
+        face_ids = np.flatnonzero(inside)
+        tri_min = tri_min[inside]
+        tri_max = tri_max[inside]
+
+        # Cells roughly as large as a typical triangle so that each face lands in a few cells only.
+        extent = np.median((tri_max - tri_min).max(axis=1)) if len(face_ids) > 0 else 0.0
+        self.cell_size = max(extent, max(width, height) / max_resolution, 1.0)
+        self.shape = np.maximum(np.ceil(size / self.cell_size).astype(np.int64), 1)
+
+        lo = np.clip(np.floor(tri_min / self.cell_size).astype(np.int64), 0, self.shape - 1)
+        hi = np.clip(np.floor(tri_max / self.cell_size).astype(np.int64), 0, self.shape - 1)
+        span = hi - lo + 1
+        counts = span[:, 0] * span[:, 1]
+
+        large = counts > max_cells_per_face
+        self.large_face_ids = face_ids[large]
+        face_ids, lo, span, counts = face_ids[~large], lo[~large], span[~large], counts[~large]
+
+        # Expand every face into the cells covered by its bounding box.
+        ids = np.repeat(face_ids, counts)
+        k = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        span_x = np.repeat(span[:, 0], counts)
+        cell_x = np.repeat(lo[:, 0], counts) + k % span_x
+        cell_y = np.repeat(lo[:, 1], counts) + k // span_x
+        cells = cell_y * self.shape[0] + cell_x
+
+        # CSR layout: faces of cell c are face_ids[offsets[c]:offsets[c + 1]].
+        order = np.argsort(cells, kind="stable")
+        self.face_ids = ids[order]
+        number_cells = int(self.shape[0] * self.shape[1])
+        self.offsets = np.zeros((number_cells + 1,), dtype=np.int64)
+        np.cumsum(np.bincount(cells, minlength=number_cells), out=self.offsets[1:])
+
+    def query(self, x, y):
+        cell_x = int(x // self.cell_size)
+        cell_y = int(y // self.cell_size)
+        if not (0 <= cell_x < self.shape[0] and 0 <= cell_y < self.shape[1]):
+            return self.large_face_ids
+        cell = cell_y * self.shape[0] + cell_x
+        cell_face_ids = self.face_ids[self.offsets[cell] : self.offsets[cell + 1]]
+        if len(self.large_face_ids) == 0:
+            return cell_face_ids
+        return np.concatenate((cell_face_ids, self.large_face_ids))
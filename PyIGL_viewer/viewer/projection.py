@@ -1,6 +1,11 @@
 import numpy as np
 import math
 
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+
 
 def magnitude(v):
     return math.sqrt(np.sum(v ** 2))
@@ -93,3 +98,32 @@ def lookat(eye, target, up):
     M[:3, :3] = np.vstack([s, u, -f])
     T = translate(-eye)
     return M * T
+
+
+if njit is not None:
+
+    @njit(cache=True, parallel=True)
+    def _ndc_to_screen(projected, width, height):
+        half_width = 0.5 * width
+        half_height = 0.5 * height
+        for i in prange(projected.shape[0]):
+            inv_w = 1.0 / projected[i, 3]
+            projected[i, 0] = (projected[i, 0] * inv_w + 1.0) * half_width
+            projected[i, 1] = (1.0 - projected[i, 1] * inv_w) * half_height
+
+else:
+    _ndc_to_screen = None
+
+
+def ndc_to_screen(projected, width, height):
+    """
+    Perspective divide and viewport transform of homogeneous clip coordinates, in place.
+    x and y become pixel coordinates with the origin at the top-left corner, z and w are left untouched.
+    """
+    if _ndc_to_screen is not None:
+        _ndc_to_screen(projected, width, height)
+        return projected
+    half_inv_w = 0.5 / projected[:, 3]
+    projected[:, 0] = (projected[:, 0] * half_inv_w + 0.5) * width
+    projected[:, 1] = (0.5 - projected[:, 1] * half_inv_w) * height
+    return projected
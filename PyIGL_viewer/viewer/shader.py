@@ -11,6 +11,7 @@ class ShaderProgram:
         fragment_shader_path,
         excluded_attributes=[],
         excluded_uniforms=[],
+        uniform_block_bindings={},
     ):
         self.name = name
         with open(vertex_shader_path, "r") as vertex_file:
@@ -44,10 +45,20 @@ class ShaderProgram:
 
         count_uniforms = gl.glGetProgramiv(self.program, gl.GL_ACTIVE_UNIFORMS)
         self.uniforms = {}
+        self.uniform_locations = {}
         for i in range(count_uniforms):
             name, size, type = gl.glGetActiveUniform(self.program, i)
             name = name.decode("utf-8")
+            uniform_location = gl.glGetUniformLocation(self.program, name)
+            self.uniform_locations[name] = uniform_location
             if name in excluded_uniforms:
                 continue
-            uniform_location = gl.glGetUniformLocation(self.program, name)
             self.uniforms[name] = uniform_location
+
+        self.uniform_blocks = {}
+        for block_name, binding in uniform_block_bindings.items():
+            block_index = gl.glGetUniformBlockIndex(self.program, block_name)
+            if block_index == gl.GL_INVALID_INDEX:
+                continue
+            gl.glUniformBlockBinding(self.program, block_index, binding)
+            self.uniform_blocks[block_name] = binding
@@ -184,6 +184,8 @@ class Viewer(QMainWindow):
         self.setStyleSheet(
             f"background-color: {self.viewer_palette['viewer_background']}"
         )
+        for widget in self.viewer_widgets:
+            widget.set_background(color)
 
     def keyPressEvent(self, e):
         if e.key() == Qt.Key_Escape:
@@ -5,16 +5,18 @@ import numpy
 import numpy as np
 from OpenGL import GL as gl
 from PyQt5.QtWidgets import QOpenGLWidget
-from PyQt5.QtGui import QSurfaceFormat, QPainter, QColor, QFont, QPolygon
+from PyQt5.QtGui import QSurfaceFormat, QPainter, QColor, QFont, QPolygon, QStaticText
 from PyQt5.QtCore import Qt, QPoint
-from queue import Queue, Empty
+from queue import Queue
 import pyvista as pv
 
-from scipy.spatial import KDTree
+from scipy.spatial import cKDTree
 
 from .shader import ShaderProgram
 from .mouse import MouseHandler
 from .camera import Camera
+from .projection import ndc_to_screen
+from .intersection import intersect_triangles, TriangleGrid, HAS_COMPILED_INTERSECTION
 
 from ..mesh import (
     MeshGroup,
@@ -23,6 +25,74 @@ from ..mesh import (
     GlMeshInstanceId,
 )
 
+def hex_to_rgb(value):
+    value = value.lstrip("#")
+    lv = len(value)
+    return tuple(int(value[i : i + lv // 3], 16) for i in range(0, lv, lv // 3))
+
+
+def face_centers(vertices, faces):
+    # Single-vertex faces (point clouds) are their own center, no need for the mean reduction.
+    if faces.shape[1] == 1:
+        return vertices[faces[:, 0]]
+    return vertices[faces].mean(axis=1)
+
+
+def uniform_setter(value):
+    """
+    Returns the function uploading a uniform of the same type and shape as value, called as setter(location, value).
+    """
+    if type(value) is bool:
+        return gl.glUniform1i
+    if hasattr(value, "shape"):
+        shape = value.shape
+        if len(shape) == 1:
+            if shape[0] == 1:
+                return lambda location, value: gl.glUniform1fv(location, 1, value)
+            if shape[0] == 2:
+                return lambda location, value: gl.glUniform2fv(location, 1, value)
+            if shape[0] == 3:
+                return lambda location, value: gl.glUniform3fv(location, 1, value)
+            if shape[0] == 4:
+                return lambda location, value: gl.glUniform4fv(location, 1, value)
+
+        if len(shape) == 2:
+            if shape[0] == shape[1] and shape[0] == 2:
+                return lambda location, value: gl.glUniformMatrix2fv(location, 1, gl.GL_FALSE, value)
+            if shape[0] == shape[1] and shape[0] == 3:
+                return lambda location, value: gl.glUniformMatrix3fv(location, 1, gl.GL_FALSE, value)
+            if shape[0] == shape[1] and shape[0] == 4:
+                return lambda location, value: gl.glUniformMatrix4fv(location, 1, gl.GL_FALSE, value.transpose())
+    return lambda location, value: None
+
+
+# std140 layout of the Globals uniform block shared by the shaders.
+GLOBALS_BINDING = 0
+GLOBALS_DTYPE = np.dtype(
+    {
+        "names": [
+            "view",
+            "projection",
+            "lightDirection",
+            "lightIntensity",
+            "ambientLighting",
+            "cameraPosition",
+            "linkLight",
+        ],
+        "formats": [
+            (np.float32, (4, 4)),
+            (np.float32, (4, 4)),
+            (np.float32, (3,)),
+            (np.float32, (3,)),
+            (np.float32, (3,)),
+            (np.float32, (3,)),
+            np.int32,
+        ],
+        "offsets": [0, 64, 128, 144, 160, 176, 188],
+        "itemsize": 192,
+    }
+)
+
 
 class ViewerWidget(QOpenGLWidget):
     def __init__(self, parent):
@@ -39,12 +109,13 @@ class ViewerWidget(QOpenGLWidget):
         self.camera = Camera(self.size())
 
         self.global_uniforms = {}
-        self.global_uniforms["lightDirection"] = np.array([0.0, 0.0, 1.0])
+        self.global_uniforms["lightDirection"] = np.array([0.0, 0.0, 1.0], dtype=np.float32)
         self.global_uniforms["lightDirection"] /= np.linalg.norm(self.global_uniforms["lightDirection"])
-        self.global_uniforms["lightIntensity"] = np.array([0.95, 0.95, 0.95])
-        self.global_uniforms["ambientLighting"] = np.array([0.05, 0.05, 0.05])
-        self.global_uniforms["cameraPosition"] = self.camera.get_position()
+        self.global_uniforms["lightIntensity"] = np.array([0.95, 0.95, 0.95], dtype=np.float32)
+        self.global_uniforms["ambientLighting"] = np.array([0.05, 0.05, 0.05], dtype=np.float32)
+        self.global_uniforms["cameraPosition"] = np.asarray(self.camera.get_position(), dtype=np.float32)
         self.global_uniforms["linkLight"] = False
+        self._uniform_setters = {}
 
         self.line_width = 1
         self.point_size = 3
@@ -63,6 +134,25 @@ class ViewerWidget(QOpenGLWidget):
         # Event queues
         self.mesh_events = Queue()
         self.post_draw_events = Queue()
+        self._mesh_dispatch = {
+            "add_mesh": self.add_mesh_,
+            "add_mesh_prefab": self.add_mesh_prefab_,
+            "add_mesh_instance": self.add_mesh_instance_,
+            "update_mesh_vertices": self.update_mesh_vertices_,
+            "update_mesh_prefab_uniform": self.update_mesh_prefab_uniform_,
+            "update_mesh_prefab_vertex_attribute": self.update_mesh_prefab_vertex_attribute_,
+            "update_mesh_prefab_face_attribute": self.update_mesh_prefab_face_attribute_,
+            "update_mesh_instance_model": self.update_mesh_instance_model_,
+            "set_mesh_instance_visibility": self.set_mesh_instance_visibility_,
+            "remove_mesh": self.remove_mesh_,
+            "remove_mesh_prefab": self.remove_mesh_prefab_,
+            "remove_mesh_instance": self.remove_mesh_instance_,
+            "clear_all": self.clear_all_,
+            "add_wireframe": self.add_wireframe_,
+        }
+        self._post_draw_dispatch = {
+            "save_screenshot": self.save_screenshot_,
+        }
 
         # Added.
         self.cursor_pos = (0, 0)
@@ -70,16 +160,33 @@ class ViewerWidget(QOpenGLWidget):
         self.faces = None
         self.face_positions = None
         self.face_normals = None
+        self._hover_core_id = None
+        self._projected = None
+        self._isect_out = None
+        self._grid = None
+        self._grid_key = None
+        self._last_view_key = None
+        self._screen_tree = None
+        self._screen_tree_ids = None
+        self._screen_tree_key = None
+        self._vis_cache = None
+        self._vis_cam_pos = None
+        self._label_cache = {}
         self.draw_indices_distance = 0.
+        self._hover_highlight_enabled = True
 
         self.depth_texture = None
 
     def set_draw_indices_distance(self, distance):
         self.draw_indices_distance = distance
 
+    def set_hover_highlight(self, enabled):
+        self._hover_highlight_enabled = enabled
+        self.update()
+
     def add_shaders(self):
         excluded_attributes = ["position"]
-        excluded_uniforms = ["mvp", "projection", "view", "model"]
+        excluded_uniforms = ["mvp", "projection", "view", "model", "drawWireframe"]
         excluded_uniforms = excluded_uniforms + list(self.global_uniforms.keys())
 
         current_file_path = os.path.dirname(os.path.abspath(__file__))
@@ -95,103 +202,79 @@ class ViewerWidget(QOpenGLWidget):
                         os.path.join(dir_name, fragment_shader_name),
                         excluded_attributes,
                         excluded_uniforms,
+                        {"Globals": GLOBALS_BINDING},
                     )
 
-    def initializeGL(self):
-        def hex_to_rgb(value):
-            value = value.lstrip("#")
-            lv = len(value)
-            return tuple(int(value[i : i + lv // 3], 16) for i in range(0, lv, lv // 3))
+    def set_background(self, color_hex):
+        self._clear_rgb = tuple(float(c) / 255.0 for c in hex_to_rgb(color_hex))
+        self.update()
 
-        r, g, b = hex_to_rgb(self.main_window.viewer_palette["viewer_background"])
+    def initializeGL(self):
+        self._clear_rgb = tuple(
+            float(c) / 255.0 for c in hex_to_rgb(self.main_window.viewer_palette["viewer_background"])
+        )
 
         self.add_shaders()
         gl.glEnable(gl.GL_DEPTH_TEST)
         gl.glDepthFunc(gl.GL_LESS)
         gl.glClearDepth(1.0)
-        gl.glClearColor(float(r) / 255.0, float(g) / 255.0, float(b) / 255.0, 1.0)
+        gl.glClearColor(*self._clear_rgb, 1.0)
         gl.glEnable(gl.GL_MULTISAMPLE)
 
+        self.globals_data = np.zeros((1,), dtype=GLOBALS_DTYPE)
+        self.globals_buffer = gl.glGenBuffers(1)
+        gl.glBindBuffer(gl.GL_UNIFORM_BUFFER, self.globals_buffer)
+        gl.glBufferData(gl.GL_UNIFORM_BUFFER, GLOBALS_DTYPE.itemsize, None, gl.GL_DYNAMIC_DRAW)
+        gl.glBindBuffer(gl.GL_UNIFORM_BUFFER, 0)
+
+    def upload_global_uniforms(self):
+        # Matrices are stored column-major in std140, hence the transposes.
+        for key in GLOBALS_DTYPE.names:
+            value = self.global_uniforms[key]
+            if key in ("view", "projection"):
+                self.globals_data[key] = np.asarray(value).transpose()
+            else:
+                self.globals_data[key] = value
+        gl.glBindBuffer(gl.GL_UNIFORM_BUFFER, self.globals_buffer)
+        gl.glBufferSubData(gl.GL_UNIFORM_BUFFER, 0, GLOBALS_DTYPE.itemsize, self.globals_data.view(np.uint8))
+        gl.glBindBuffer(gl.GL_UNIFORM_BUFFER, 0)
+        gl.glBindBufferBase(gl.GL_UNIFORM_BUFFER, GLOBALS_BINDING, self.globals_buffer)
+
     def bind_global_uniforms(self, shader_program):
         for key, value in self.global_uniforms.items():
-            location = gl.glGetUniformLocation(shader_program, key)
+            location = shader_program.uniform_locations.get(key, -1)
             if location != -1:
-                if type(value) is bool:
-                    gl.glUniform1i(location, value)
-                if hasattr(value, "shape"):
-                    shape = value.shape
-                    if len(shape) == 1:
-                        if shape[0] == 1:
-                            gl.glUniform1fv(location, 1, value)
-                        if shape[0] == 2:
-                            gl.glUniform2fv(location, 1, value)
-                        if shape[0] == 3:
-                            gl.glUniform3fv(location, 1, value)
-                        if shape[0] == 4:
-                            gl.glUniform4fv(location, 1, value)
-
-                    if len(shape) == 2:
-                        if shape[0] == shape[1] and shape[0] == 2:
-                            gl.glUniformMatrix2fv(location, 1, gl.GL_FALSE, value)
-                        if shape[0] == shape[1] and shape[0] == 3:
-                            gl.glUniformMatrix3fv(location, 1, gl.GL_FALSE, value)
-                        if shape[0] == shape[1] and shape[0] == 4:
-                            gl.glUniformMatrix4fv(
-                                location, 1, gl.GL_FALSE, value.transpose()
-                            )
+                setter = self._uniform_setters.get(key)
+                if setter is None:
+                    setter = uniform_setter(value)
+                    self._uniform_setters[key] = setter
+                setter(location, value)
+
+    @staticmethod
+    def intersect_triangles(ray_start, ray_end, vertices, faces, out=None):
+        return intersect_triangles(ray_start, ray_end, vertices, faces, out)
 
     @staticmethod
-    def intersect_triangles(ray_start, ray_end, vertices, faces):
-        """
-        See https://stackoverflow.com/questions/42740765/intersection-between-line-and-triangle-in-3d
-
-        :param ray_start:
-        :param ray_end:
-        :param vertices:
-        :param faces:
-        :return:
-        """
-        A = vertices[faces[:, 0]]
-        B = vertices[faces[:, 1]]
-        C = vertices[faces[:, 2]]
-        E1 = B - A
-        E2 = C - A
-        RO = ray_start.reshape(1, -1).repeat(A.shape[0], axis=0)
-        RD = ray_end.reshape(1, -1).repeat(A.shape[0], axis=0)
-
-        N = np.cross(E1, E2)
-        det = -((RD - RO) * N).sum(axis=1)
-        valid_mask = det != 0
-        intersect = np.zeros((A.shape[0],), dtype=np.bool)
-        if np.any(valid_mask):
-            AO = RO - A
-            inv_det = 1 / det[valid_mask]
-            DAO = np.cross(AO, RD - RO)
-            u = (E2 * DAO).sum(1) * inv_det
-            v = -(E1 * DAO).sum(1) * inv_det
-            t = (AO * N).sum(1) * inv_det
-
-            intersect[valid_mask] = (det >= 1e-6) & (t >= 0) & (u >= 0) & (v >= 0) & (u + v <= 1)
-
-        return intersect
+    def on_screen(projected_vertices, width, height):
+        return (
+            (projected_vertices[:, 3] > 0)
+            & np.all(projected_vertices[:, :2] >= 0, axis=1)
+            & (projected_vertices[:, 0] <= width)
+            & (projected_vertices[:, 1] <= height)
+        )
 
     def paintGL(self):
         self.process_mesh_events()
 
         gl.glPointSize(self.point_size)
-
-        def hex_to_rgb(value):
-            value = value.lstrip("#")
-            lv = len(value)
-            return tuple(int(value[i : i + lv // 3], 16) for i in range(0, lv, lv // 3))
-
-        r, g, b = hex_to_rgb(self.main_window.viewer_palette["viewer_background"])
-        gl.glClearColor(float(r) / 255.0, float(g) / 255.0, float(b) / 255.0, 1.0)
+        gl.glClearColor(*self._clear_rgb, 1.0)
 
         gl.glClear(gl.GL_DEPTH_BUFFER_BIT | gl.GL_COLOR_BUFFER_BIT)
-        self.global_uniforms["view"] = self.camera.get_view_matrix()
-        self.global_uniforms["projection"] = self.camera.get_projection_matrix()
-        self.global_uniforms["cameraPosition"] = self.camera.get_position()
+        self.global_uniforms["view"] = np.asarray(self.camera.get_view_matrix(), dtype=np.float32)
+        self.global_uniforms["projection"] = np.asarray(self.camera.get_projection_matrix(), dtype=np.float32)
+        self.global_uniforms["cameraPosition"] = np.asarray(self.camera.get_position(), dtype=np.float32)
+        self.upload_global_uniforms()
+        projection_view = self.global_uniforms["projection"] @ self.global_uniforms["view"]
         for group in self.mesh_groups.values():
             for core, prefab, instance in group:
                 if not instance.get_visibility():
@@ -205,10 +288,12 @@ class ViewerWidget(QOpenGLWidget):
                 else:
                     gl.glPolygonMode(gl.GL_FRONT_AND_BACK, gl.GL_LINE)
                     gl.glLineWidth(self.line_width)
-                shader_program = prefab.get_shader().program
-                gl.glUseProgram(shader_program)
+                shader = prefab.get_shader()
+                gl.glUseProgram(shader.program)
 
-                self.bind_global_uniforms(shader_program)
+                # Shaders using the Globals block read them from the uniform buffer.
+                if "Globals" not in shader.uniform_blocks:
+                    self.bind_global_uniforms(shader)
 
                 # # Load projection matrix
                 # projection_location = gl.glGetUniformLocation(shader_program, 'projection')
@@ -223,25 +308,21 @@ class ViewerWidget(QOpenGLWidget):
                 if model_matrix is None:
                     instance.set_model_matrix(np.eye(4, dtype="f"))
                     model_matrix = instance.get_model_matrix()
-                model_location = gl.glGetUniformLocation(shader_program, "model")
+                model_location = shader.uniform_locations.get("model", -1)
                 gl.glUniformMatrix4fv(
                     model_location, 1, False, model_matrix.transpose()
                 )
 
-                mvp_location = gl.glGetUniformLocation(shader_program, "mvp")
-                gl.glUniformMatrix4fv(
-                    mvp_location,
-                    1,
-                    False,
-                    (
-                        self.global_uniforms["projection"]
-                        * self.global_uniforms["view"]
-                        * model_matrix
-                    ).transpose(),
-                )
-                mvp_matrix = \
-                    np.asarray((self.global_uniforms["projection"] * self.global_uniforms["view"] * model_matrix)
-                               .transpose())
+                # Row-major matrix, transposed by GL on upload.
+                mvp = projection_view @ np.asarray(model_matrix, dtype=np.float32)
+                mvp_location = shader.uniform_locations.get("mvp", -1)
+                gl.glUniformMatrix4fv(mvp_location, 1, gl.GL_TRUE, mvp)
+                mvp_matrix = mvp.transpose()
+
+                # Shaders drawing the wireframe in the same pass follow the wireframe toggle through this uniform.
+                draw_wireframe_location = shader.uniform_locations.get("drawWireframe", -1)
+                if draw_wireframe_location != -1:
+                    gl.glUniform1i(draw_wireframe_location, self.draw_wireframe)
 
                 # Draw mesh
                 core.bind_buffers()
@@ -276,57 +357,92 @@ class ViewerWidget(QOpenGLWidget):
 
         if self.vertices is not None:
             indices = np.arange(self.vertices.shape[0])
-            projected_vertices = self.vertices @ mvp_matrix
-
-            projected_vertices[:, :2] /= projected_vertices[:, 3].reshape(-1, 1)
-
-            projected_vertices[:, :2] = (projected_vertices[:, :2] + 1) / 2
+            projected_vertices = np.matmul(self.vertices, mvp_matrix, out=self._projected)
 
-            projected_vertices[:, 1] = 1 - projected_vertices[:, 1]
-            in_range_mask = np.all((projected_vertices >= 0) & (projected_vertices <= 1), axis=1)
-
-            projected_vertices[:, 0] *= self.size().width()
-            projected_vertices[:, 1] *= self.size().height()
-
-            intersections = self.intersect_triangles(np.array([self.cursor_pos[0], self.cursor_pos[1], 0.]),
-                                                     np.array([self.cursor_pos[0], self.cursor_pos[1], 1.]),
-                                                     projected_vertices[:, :3], self.faces)
-            if np.any(intersections):
-                faces_candidates = self.faces[intersections]
-                triangle_positions = projected_vertices[faces_candidates].mean(axis=1)
-
-                tri_sel = np.argmin(triangle_positions[:, 2])
-                selected_triangle = faces_candidates[tri_sel]
-                selected_position = self.vertices[selected_triangle][:, :3].mean(axis=1)
-                selected_idx = selected_triangle[np.argmin(
-                    (projected_vertices[selected_triangle][:, :2] -
-                     np.array([self.cursor_pos[0], self.cursor_pos[1]])).sum(1) ** 2)]
+            width, height = self.size().width(), self.size().height()
+            ndc_to_screen(projected_vertices, width, height)
+            in_range_mask = np.all(
+                (projected_vertices >= 0) & (projected_vertices <= np.array([width, height, 1, 1])), axis=1
+            )
 
+            grid_key = (width, height, mvp_matrix.tobytes())
+            # Screen-space acceleration structures are only worth building once the view stays the same for a
+            # second frame, e.g. while hovering. During camera moves they would be rebuilt for a single query.
+            view_still = grid_key == self._last_view_key
+            self._last_view_key = grid_key
+            selected_triangle = None
+            selected_position = None
+            selected_idx = None
+            if self._hover_highlight_enabled and self.faces.shape[1] == 1:
+                # Points cannot be hit by the ray, pick the closest one on screen instead.
+                if view_still or (self._screen_tree is not None and self._screen_tree_key == grid_key):
+                    if self._screen_tree is None or self._screen_tree_key != grid_key:
+                        self._screen_tree_ids = np.flatnonzero(self.on_screen(projected_vertices, width, height))
+                        self._screen_tree = cKDTree(projected_vertices[self._screen_tree_ids, :2])
+                        self._screen_tree_key = grid_key
+                    distance, nearest = self._screen_tree.query(self.cursor_pos, distance_upper_bound=8)
+                    if np.isfinite(distance):
+                        selected_idx = self._screen_tree_ids[nearest]
+                else:
+                    # The view is moving, a linear scan is cheaper than building a tree for a single query.
+                    candidates = np.flatnonzero(self.on_screen(projected_vertices, width, height))
+                    offsets = projected_vertices[candidates, :2] - np.array(self.cursor_pos, dtype=np.float32)
+                    squared_distances = np.einsum("ij,ij->i", offsets, offsets)
+                    if len(candidates) > 0 and squared_distances.min() <= 8 ** 2:
+                        selected_idx = candidates[np.argmin(squared_distances)]
+            elif self._hover_highlight_enabled and self.faces.shape[1] >= 3:
+                # The compiled kernel tests every face faster than the grid is built, otherwise only test the
+                # triangles whose screen bounding box contains the cursor while the view is still.
+                candidate_faces = self.faces
+                if not HAS_COMPILED_INTERSECTION and view_still:
+                    if self._grid is None or self._grid_key != grid_key:
+                        self._grid = TriangleGrid(projected_vertices[:, :2], self.faces, width, height)
+                        self._grid_key = grid_key
+                    candidate_faces = self.faces[self._grid.query(*self.cursor_pos)]
+
+                intersections = self.intersect_triangles(np.array([self.cursor_pos[0], self.cursor_pos[1], 0.]),
+                                                         np.array([self.cursor_pos[0], self.cursor_pos[1], 1.]),
+                                                         projected_vertices[:, :3], candidate_faces,
+                                                         out=self._isect_out[:candidate_faces.shape[0]])
+                if np.any(intersections):
+                    faces_candidates = candidate_faces[intersections]
+                    triangle_positions = projected_vertices[faces_candidates].mean(axis=1)
+
+                    tri_sel = np.argmin(triangle_positions[:, 2])
+                    selected_triangle = faces_candidates[tri_sel]
+                    selected_position = self.vertices[selected_triangle][:, :3].mean(axis=1)
+                    selected_idx = selected_triangle[np.argmin(
+                        (projected_vertices[selected_triangle][:, :2] -
+                         np.array([self.cursor_pos[0], self.cursor_pos[1]])).sum(1) ** 2)]
+
+            if selected_idx is not None:
                 painter.setBrush(QColor(0, 255, 0))
                 painter.setPen(QColor(0, 255, 0))
                 v = projected_vertices[selected_idx]
                 painter.drawText(v[0], v[1], f"{selected_idx}")
                 painter.drawEllipse(v[0] - 2, v[1] - 2, 4, 4)
-                painter.setBrush(QColor(0, 200, 0))
-                tri = projected_vertices[selected_triangle][:, :2]
-                painter.drawPolygon(QPolygon([QPoint(tri[0][0], tri[0][1]),
-                                              QPoint(tri[1][0], tri[1][1]),
-                                              QPoint(tri[2][0], tri[2][1])]))
+                if selected_triangle is not None:
+                    painter.setBrush(QColor(0, 200, 0))
+                    tri = projected_vertices[selected_triangle][:, :2]
+                    painter.drawPolygon(QPolygon([QPoint(corner[0], corner[1]) for corner in tri]))
                 painter.setPen(QColor(255, 255, 255))
                 painter.setBrush(QColor(255, 255, 255))
-            else:
-                selected_triangle = None
-                selected_position = None
-                selected_idx = None
 
             if self.draw_indices_distance > 0:
                 # Filter out invisible vertices.
-                # Back-face culling.
-                visible_face_idx = \
-                    ((self.face_positions - self.camera.get_position()) * self.face_normals).sum(axis=1) < 0
-                visible_idx = np.unique(self.faces[visible_face_idx])
-                visible_mask = np.zeros_like(in_range_mask)
-                visible_mask[visible_idx] = True
+                # Back-face culling, only recomputed when the camera moves.
+                camera_position = self.camera.get_position()
+                if self.face_normals is None:
+                    # Without face normals, e.g. meshes shaded with vertex normals, every vertex is kept.
+                    self._vis_cache = np.ones_like(in_range_mask)
+                    self._vis_cam_pos = None
+                elif self._vis_cache is None or not np.array_equal(camera_position, self._vis_cam_pos):
+                    visible_face_idx = \
+                        np.einsum("ij,ij->i", self.face_positions - camera_position, self.face_normals) < 0
+                    self._vis_cache = np.zeros_like(in_range_mask)
+                    self._vis_cache[self.faces[visible_face_idx].ravel()] = True
+                    self._vis_cam_pos = np.array(camera_position)
+                visible_mask = self._vis_cache
 
                 all_valid_idx = visible_mask & in_range_mask
                 projected_vertices = projected_vertices[all_valid_idx]
@@ -336,15 +452,25 @@ class ViewerWidget(QOpenGLWidget):
                     draw_dist_idx = projected_vertices[:, 2] < self.draw_indices_distance
                     indices_draw = indices[draw_dist_idx]
                     if len(indices_draw) > 0:
-                        for vi, v in enumerate(projected_vertices[draw_dist_idx]):
-                            if (selected_idx is None) or \
-                                    (selected_idx is not None and indices_draw[vi] != selected_idx):
-                                painter.drawText(v[0], v[1], f"{indices_draw[vi]}")
+                        # Static texts are positioned by their top-left corner, drawText by its baseline.
+                        ascent = painter.fontMetrics().ascent()
+                        positions = projected_vertices[draw_dist_idx, :2].astype(np.int32).tolist()
+                        for idx, (x, y) in zip(indices_draw.tolist(), positions):
+                            if idx != selected_idx:
+                                painter.drawStaticText(x, y - ascent, self.get_index_label(idx))
         painter.end()
         gl.glPopAttrib()
 
         self.process_post_draw_events()
 
+    def get_index_label(self, idx):
+        label = self._label_cache.get(idx)
+        if label is None:
+            label = QStaticText(str(idx))
+            label.setPerformanceHint(QStaticText.AggressiveCaching)
+            self._label_cache[idx] = label
+        return label
+
     def resizeGL(self, width, height):
         self.camera.handle_resize(width, height)
 
@@ -380,7 +506,9 @@ class ViewerWidget(QOpenGLWidget):
     def mouseMoveEvent(self, e):
         self.mouse_handler.add_mouse_move_event(e)
         self.cursor_pos = e.x(), e.y()
-        self.update()
+        # Only the hovered vertex highlight depends on the cursor position.
+        if self.vertices is not None and self._hover_highlight_enabled:
+            self.update()
 
         if self.mouse_handler.button_pressed(Qt.LeftButton):
             delta = self.mouse_handler.pressed_delta_mouse(Qt.LeftButton)
@@ -414,25 +542,33 @@ class ViewerWidget(QOpenGLWidget):
     # Mesh adding, updating and removing
 
     def process_mesh_events(self):
-        while True:
-            try:
-                event = self.mesh_events.get(block=False)
-                event_type = event[0]
-                mesh_function = getattr(self, event_type + "_")
-                mesh_function(*event[1:])
-            except Empty:
-                return
+        while not self.mesh_events.empty():
+            event = self.mesh_events.get_nowait()
+            self._mesh_dispatch[event[0]](*event[1:])
 
     def add_mesh_(self, core_id, vertices, faces):
-        vertices = vertices.astype(np.float32)
+        vertices = vertices.astype(np.float32, copy=False)
         faces = faces.astype(np.int32)
         self.mesh_groups[core_id.core_id] = MeshGroup(vertices, faces)
 
-    def add_mesh(self, vertices, faces):
-        self.vertices = np.concatenate([vertices, np.ones((vertices.shape[0], 1))], axis=1)
-        self.faces = faces
-        self.face_positions = vertices[faces].mean(axis=1)
+    def add_mesh(self, vertices, faces, face_positions=None):
+        # Homogeneous float32 copy of the vertices used for hovering, reused when the vertex count allows it.
+        if self.vertices is None or self.vertices.shape[0] != vertices.shape[0]:
+            self.vertices = np.empty((vertices.shape[0], 4), dtype=np.float32)
+            self.vertices[:, 3] = 1.0
+            self._projected = np.empty_like(self.vertices)
+        np.copyto(self.vertices[:, :3], vertices)
+        self.faces = faces.astype(np.int32)
+        self._isect_out = np.empty((faces.shape[0],), dtype=np.bool_)
+        self._grid = None
+        self._screen_tree = None
+        self._vis_cache = None
+        # Face normals of the previous mesh do not match these faces, a prefab with a face normal sets them again.
+        self.face_normals = None
+        # Callers that already computed the face centers can pass them to skip the gather and mean.
+        self.face_positions = face_centers(vertices, faces) if face_positions is None else face_positions
         core_id = GlMeshCoreId()
+        self._hover_core_id = core_id.core_id
         self.mesh_events.put(["add_mesh", core_id, vertices, faces])
 
         return core_id
@@ -493,7 +629,9 @@ class ViewerWidget(QOpenGLWidget):
     ):
         prefab_id = GlMeshPrefabId(core_id)
         if "normal" in face_attributes:
-            self.face_normals = face_attributes["normal"]
+            # Normals may be padded to 4 components for the GPU, the back-face test only needs x, y and z.
+            self.face_normals = face_attributes["normal"][:, :3]
+            self._vis_cache = None
         self.mesh_events.put(
             [
                 "add_mesh_prefab",
@@ -517,7 +655,17 @@ class ViewerWidget(QOpenGLWidget):
         return instance_id
 
     def update_mesh_vertices_(self, core_id, vertices):
-        self.get_mesh(core_id).update_vertices(vertices.astype(np.float32))
+        vertices = vertices.astype(np.float32, copy=False)
+        self.get_mesh(core_id).update_vertices(vertices)
+        # Keep the hovering data in sync with the displayed mesh.
+        if core_id.core_id == self._hover_core_id:
+            np.copyto(self.vertices[:, :3], vertices)
+            self.face_positions = face_centers(vertices, self.faces)
+            # An animated mesh changes on screen like a moving camera, do not rebuild the grid for it every frame.
+            self._last_view_key = None
+            self._grid = None
+            self._screen_tree = None
+            self._vis_cache = None
 
     def update_mesh_vertices(self, core_id, vertices):
         self.mesh_events.put(["update_mesh_vertices", core_id, vertices])
@@ -589,14 +737,18 @@ class ViewerWidget(QOpenGLWidget):
     # General viewer settings
 
     def set_directional_light(self, direction, intensity):
-        self.global_uniforms["lightDirection"] = direction / np.linalg.norm(direction)
-        self.global_uniforms["lightIntensity"] = intensity
+        self.global_uniforms["lightDirection"] = np.asarray(direction / np.linalg.norm(direction), dtype=np.float32)
+        self.global_uniforms["lightIntensity"] = np.asarray(intensity, dtype=np.float32)
+        self._uniform_setters.pop("lightDirection", None)
+        self._uniform_setters.pop("lightIntensity", None)
 
     def set_ambient_light(self, intensity):
-        self.global_uniforms["ambientLighting"] = intensity
+        self.global_uniforms["ambientLighting"] = np.asarray(intensity, dtype=np.float32)
+        self._uniform_setters.pop("ambientLighting", None)
 
     def link_light_to_camera(self, link=True):
         self.global_uniforms["linkLight"] = link
+        self._uniform_setters.pop("linkLight", None)
 
     def toggle_wireframe(self):
         self.draw_wireframe = not self.draw_wireframe
@@ -608,14 +760,9 @@ class ViewerWidget(QOpenGLWidget):
     # Post-draw events
 
     def process_post_draw_events(self):
-        while True:
-            try:
-                event = self.post_draw_events.get(block=False)
-                event_type = event[0]
-                mesh_function = getattr(self, event_type + "_")
-                mesh_function(*event[1:])
-            except Empty:
-                return
+        while not self.post_draw_events.empty():
+            event = self.post_draw_events.get_nowait()
+            self._post_draw_dispatch[event[0]](*event[1:])
 
     def save_screenshot_(self, path):
         current_frame = self.grabFramebuffer()
@@ -654,7 +801,7 @@ class ViewerWidget(QOpenGLWidget):
             face_attributes=face_attributes,
             uniforms=uniforms,
         )
-        mesh_instance_id = self.add_mesh_instance(mesh_prefab_id, np.eye(4))
+        mesh_instance_id = self.add_mesh_instance(mesh_prefab_id, np.eye(4, dtype="f"))
         return mesh_instance_id
 
     def display_mesh(self, vertices, faces, normals):
@@ -671,7 +818,7 @@ class ViewerWidget(QOpenGLWidget):
             face_attributes=face_attributes,
             uniforms=uniforms,
         )
-        mesh_instance_id = self.add_mesh_instance(mesh_prefab_id, np.eye(4))
+        mesh_instance_id = self.add_mesh_instance(mesh_prefab_id, np.eye(4, dtype="f"))
         return mesh_instance_id
 
     def display_quad_net(
@@ -691,7 +838,7 @@ class ViewerWidget(QOpenGLWidget):
             face_attributes=face_attributes,
             uniforms=uniforms,
         )
-        mesh_instance_id = self.add_mesh_instance(mesh_prefab_id, np.eye(4))
+        mesh_instance_id = self.add_mesh_instance(mesh_prefab_id, np.eye(4, dtype="f"))
         return mesh_instance_id
 
     def add_wireframe(self, mesh_instance_id, line_color=np.array([0.0, 0.0, 0.0])):
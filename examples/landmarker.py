@@ -1,24 +1,213 @@
+import gc
 import os
+import sys
+import tempfile
+import traceback
+import zipfile
+from pathlib import Path
 
 import numpy as np
+import scipy.sparse as sp
 import trimesh
-from PyQt5.QtWidgets import QApplication, QLabel, QSlider, QHBoxLayout, QWidget
-from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import QApplication, QLabel, QMessageBox, QSlider, QHBoxLayout, QWidget
+from PyQt5.QtCore import Qt, QThread, QTimer, pyqtSignal
 from PyIGL_viewer import Viewer
 
+# Rows processed at once by normalize_vertices, about 200 KB of float32 coordinates.
+NORMALIZE_BLOCK_ROWS = 16384
 
-script_folder = os.path.dirname(__file__)
-path_to_obj_file = r"D:\work\wrist40-right-watertight.obj"
-# Path to your OBJ file stored in path_to_obj_file
-mesh = trimesh.load(path_to_obj_file)
-vertices, faces = mesh.vertices, mesh.faces
+# Shade with normals interpolated from the vertices instead of one normal per face.
+SMOOTH_SHADING = False
+
+# Model matrix shared by the instances placed at the origin. The viewer never modifies it in place.
+IDENTITY4 = np.eye(4, dtype=np.float32)
+IDENTITY4.setflags(write=False)
+
+
+def principal_axes(covariance):
+    """
+    Rotation whose columns are the principal axes sorted by decreasing variance.
+    The last axis is flipped if needed so that the rotation does not mirror the mesh and its face winding.
+    """
+    _, axes = np.linalg.eigh(covariance)
+    rotation = axes[:, ::-1].copy()
+    if np.linalg.det(rotation) < 0:
+        rotation[:, 2] = -rotation[:, 2]
+    return rotation
+
+
+def normalize_vertices(vertices):
+    """
+    Centers the vertices on their mean, aligns their principal axes with x, y and z, and scales them into the sphere
+    of radius 0.5, in place.
+    """
+    center = vertices.mean(axis=0)
+    covariance = np.zeros((3, 3))
+    max_norm = 0.0
+    # Center block by block and accumulate the moments while the rows are still in cache.
+    for start in range(0, vertices.shape[0], NORMALIZE_BLOCK_ROWS):
+        block = vertices[start : start + NORMALIZE_BLOCK_ROWS]
+        block -= center
+        block64 = block.astype(np.float64)
+        covariance += block64.T @ block64
+        max_norm = max(max_norm, np.einsum("ij,ij->i", block64, block64).max())
+    covariance /= vertices.shape[0]
+    max_norm = np.sqrt(max_norm)
+
+    # Rotations keep the distances to the center, so the scaling folds into the same transform.
+    # A radius of 0.5 keeps the mesh in front of the default camera and within the depth range of the slider.
+    rotation = principal_axes(covariance)
+    transform = (rotation / max(2.0 * max_norm, 1e-20)).astype(vertices.dtype)
+    for start in range(0, vertices.shape[0], NORMALIZE_BLOCK_ROWS):
+        block = vertices[start : start + NORMALIZE_BLOCK_ROWS]
+        block[:] = block @ transform
+    return vertices
+
+
+def triangle_planes(vertices, faces):
+    """
+    Gathers the triangle corners once as structure-of-arrays planes tri_x, tri_y and tri_z.
+    Each plane has shape (3, F) and plane[k] holds the coordinate of corner k of every face contiguously.
+    """
+    tri = vertices[faces].astype(np.float32, copy=False)
+    tri_x, tri_y, tri_z = np.ascontiguousarray(tri.transpose(2, 1, 0))
+    return tri_x, tri_y, tri_z
+
+
+def compute_face_geometry(vertices, faces):
+    """
+    Unit face normals and face centroids, computed together from a single gather of the triangle corners.
+    """
+    tri_x, tri_y, tri_z = triangle_planes(vertices, faces)
+    centroids = np.stack((tri_x.mean(axis=0), tri_y.mean(axis=0), tri_z.mean(axis=0)), axis=1)
+    e1x, e1y, e1z = tri_x[1] - tri_x[0], tri_y[1] - tri_y[0], tri_z[1] - tri_z[0]
+    e2x, e2y, e2z = tri_x[2] - tri_x[0], tri_y[2] - tri_y[0], tri_z[2] - tri_z[0]
+    n = np.stack((e1y * e2z - e1z * e2y, e1z * e2x - e1x * e2z, e1x * e2y - e1y * e2x), axis=1)
+    n /= np.linalg.norm(n, axis=1, keepdims=True).clip(1e-20)
+    return n.astype(np.float32, copy=False), centroids.astype(np.float32, copy=False)
+
+
+def compute_vertex_normals(vertices, faces, face_normals):
+    """
+    Unit vertex normals obtained by summing the normals of the faces around each vertex.
+    """
+    # Sparse vertex/face incidence matrix, the sum over the faces of each vertex is then a single product.
+    number_faces = faces.shape[0]
+    incidence = sp.csr_matrix(
+        (np.ones(faces.size, dtype=np.float32), (faces.ravel(), np.repeat(np.arange(number_faces), faces.shape[1]))),
+        shape=(vertices.shape[0], number_faces),
+    )
+    vertex_normals = np.asarray(incidence @ face_normals, dtype=np.float32)
+    vertex_normals /= np.linalg.norm(vertex_normals, axis=1, keepdims=True).clip(1e-20)
+    return vertex_normals
+
+
+def quantize_normals(normals):
+    """
+    Unit normals as int8 SNORM values, read back by the GPU as floats in [-1, 1] at a quarter of the size.
+    A zero w component pads each normal to 4 bytes, as drivers may repack attributes that are not 4-byte aligned.
+    """
+    quantized = np.zeros((normals.shape[0], 4), dtype=np.int8)
+    quantized[:, :3] = np.clip(np.rint(normals * 127.0), -127, 127)
+    return quantized
+
+
+def read_mesh_cache(cache_path, path):
+    """
+    Vertices and faces stored in the cache, or None when the cache is missing, older than the OBJ file or unreadable.
+    """
+    try:
+        if cache_path.stat().st_mtime < path.stat().st_mtime:
+            return None
+        with np.load(cache_path) as data:
+            return data["v"], data["f"]
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+        return None
+
+
+def write_mesh_cache(cache_path, vertices, faces):
+    """
+    Writes the cache to a temporary file first, so that an interrupted write never leaves a broken cache behind.
+    """
+    temporary_file = tempfile.NamedTemporaryFile(dir=cache_path.parent, suffix=".npz", delete=False)
+    try:
+        with temporary_file:
+            np.savez(temporary_file, v=vertices, f=faces)
+        os.replace(temporary_file.name, cache_path)
+    except OSError:
+        os.remove(temporary_file.name)
+        raise
+
+
+def load_mesh(path):
+    """
+    Loads the OBJ file and prepares the arrays for display: normalized float32 vertices, faces, face normals and
+    face centroids.
+    """
+    # Parsing the OBJ text is slow, keep a binary copy of the arrays next to it for later runs.
+    cache_path = path.with_name(path.name + ".npz")
+    cached = read_mesh_cache(cache_path, path)
+    if cached is not None:
+        vertices, faces = cached
+    else:
+        # Skip trimesh's post-processing (vertex merging, duplicate and degenerate face removal) and materials.
+        # Vertices also keep the order of the OBJ file, so the displayed indices match the file.
+        mesh = trimesh.load(path, process=False, skip_materials=True, maintain_order=True, force="mesh")
+        # np.array copies into plain ndarrays, detached from trimesh's TrackedArray and its hashing on every write.
+        vertices = np.array(mesh.vertices, dtype=np.float32)
+        # Smallest unsigned type able to index every vertex, which also keeps the cache file small.
+        faces = np.array(mesh.faces, dtype=np.uint16 if len(vertices) < 2**16 else np.uint32)
+        # The mesh and its caches reference each other, collect them now rather than at some later collection.
+        del mesh
+        gc.collect()
+        try:
+            write_mesh_cache(cache_path, vertices, faces)
+        except OSError as err:
+            # The cache is optional, e.g. the folder of the OBJ file may be read-only.
+            print(f"Could not write the mesh cache {cache_path}: {err}", file=sys.stderr)
+
+    vertices = normalize_vertices(vertices)
+    # Match the float layout of the GL buffers so the viewer does not need to convert them.
+    vertices = np.ascontiguousarray(vertices, dtype=np.float32)
+    faces = np.ascontiguousarray(faces)
+    # Normals and centroids of the normalized mesh, the viewer reuses the centroids instead of recomputing them.
+    face_normals, face_centroids = compute_face_geometry(vertices, faces)
+    return vertices, faces, face_normals, face_centroids
+
+
+class MeshLoader(QThread):
+    """
+    Loads and prepares the mesh away from the GUI thread, so that the viewer window shows up right away.
+    """
 
-bbox_min = np.min(vertices, axis=0)
-bbox_max = np.max(vertices, axis=0)
-scaling_factor = 1.0 / np.max(bbox_max - bbox_min)
-center = np.mean(vertices, axis=0)
-vertices -= center
-vertices *= scaling_factor
+    mesh_loaded = pyqtSignal(object)
+    # Formatted traceback of the error, exceptions must not escape run() as PyQt would abort the application.
+    loading_failed = pyqtSignal(str)
+
+    def __init__(self, path, parent=None):
+        super().__init__(parent)
+        self.path = path
+
+    def run(self):
+        try:
+            mesh = load_mesh(self.path)
+        except Exception:
+            if not self.isInterruptionRequested():
+                self.loading_failed.emit(traceback.format_exc())
+            return
+        # The viewer may have been closed during the loading, nobody is left to display the mesh.
+        if not self.isInterruptionRequested():
+            self.mesh_loaded.emit(mesh)
+
+    def stop(self):
+        # The OBJ parsing cannot be cancelled, wait for it so that the thread is not destroyed while running.
+        self.requestInterruption()
+        self.wait()
+
+
+script_folder = Path(__file__).parent
+path_to_obj_file = Path(r"D:\work\wrist40-right-watertight.obj")
+# Path to your OBJ file stored in path_to_obj_file
 
 
 # Create Qt application and our viewer window
@@ -30,7 +219,6 @@ viewer.set_column_stretch(0, 1)
 # Add a viewer widget to visualize 3D meshes to our viewer window
 viewer_widget, _ = viewer.add_viewer_widget(0, 0)
 viewer_widget.show()
-viewer_widget.link_light_to_camera()
 
 # Arrange layouts.
 menu = viewer.current_menu_layout
@@ -43,12 +231,34 @@ view_distance_slider_label = QLabel(viewer)
 view_distance_slider_label.setText(f"{0:.02f}")
 
 
+# Slider moves are coalesced so that the viewer is redrawn at most once per frame (~60 Hz).
+pending_view_distance = 0.0
+
+
+def apply_view_distance():
+    viewer_widget.set_draw_indices_distance(pending_view_distance)
+    viewer_widget.update()
+
+
+view_distance_timer = QTimer(viewer)
+view_distance_timer.setSingleShot(True)
+view_distance_timer.setInterval(16)
+view_distance_timer.timeout.connect(apply_view_distance)
+
+
 def view_distance_slider_update(value):
+    global pending_view_distance
     if value <= 80:
         value = 0
     view_distance_slider_label.setText(f"{value / 100:.02f}")
-    viewer_widget.set_draw_indices_distance(value / 100)
-    viewer_widget.update()
+    pending_view_distance = value / 100
+    if not view_distance_timer.isActive():
+        view_distance_timer.start()
+
+
+def view_distance_slider_release():
+    view_distance_timer.stop()
+    apply_view_distance()
 
 
 view_distance_slider = QSlider(Qt.Horizontal, viewer)
@@ -56,6 +266,7 @@ view_distance_slider.setRange(80, 100)
 view_distance_slider.setPageStep(1)
 view_distance_slider.setSliderPosition(0)
 view_distance_slider.sliderMoved.connect(view_distance_slider_update)
+view_distance_slider.sliderReleased.connect(view_distance_slider_release)
 hbox.addWidget(view_distance_slider)
 hbox.addSpacing(15)
 hbox.addWidget(view_distance_slider_label)
@@ -67,47 +278,62 @@ menu.addWidget(view_distance_label)
 menu.addWidget(hbox_widget)
 
 
-# Add a mesh to our viewer widget
+# Add a mesh to our viewer widget once it is loaded
 # This requires three steps:
 # - Adding the mesh vertices and faces
 # - Adding a mesh prefab that contains shader attributes and uniform values
 # - Adding an instance of our prefab whose position is defined by a model matrix
+def on_mesh_loaded(mesh):
+    vertices, faces, face_normals, face_centroids = mesh
+
+    # Here, we use the lambert_wireframe shader, which draws the mesh and its wireframe in a single pass.
+    # This shader requires three things:
+    # - A uniform value called 'albedo' for the color of the mesh.
+    # - A uniform value called 'lineColor' for the color of the wireframe.
+    # - An attribute called 'normal' for the mesh normals.
+    uniforms = {}
+    vertex_attributes = {}
+    face_attributes = {}
+
+    uniforms["albedo"] = np.array([0.8, 0.8, 0.8])
+    uniforms["lineColor"] = np.array([0.1, 0.1, 0.1])
+
+    if SMOOTH_SHADING:
+        # Smooth shading with normals defined per vertex.
+        vertex_normals = compute_vertex_normals(vertices, faces, face_normals)
+        vertex_attributes["normal"] = quantize_normals(vertex_normals)
+    else:
+        # Flat shading with normals defined per face.
+        face_attributes["normal"] = quantize_normals(face_normals)
+
+    mesh_index = viewer_widget.add_mesh(vertices, faces, face_positions=face_centroids)
+    mesh_prefab_index = viewer_widget.add_mesh_prefab(
+        mesh_index,
+        "lambert_wireframe",
+        vertex_attributes=vertex_attributes,
+        face_attributes=face_attributes,
+        uniforms=uniforms,
+    )
+    viewer_widget.add_mesh_instance(mesh_prefab_index, IDENTITY4)
+    # Link the light once the mesh is in place, so that the first frame is drawn with the complete scene.
+    viewer_widget.link_light_to_camera()
+    viewer_widget.update()
+
+
+def on_loading_failed(error):
+    print(error, file=sys.stderr)
+    QMessageBox.critical(viewer, "IGL viewer", f"Could not load {path_to_obj_file}:\n\n{error.splitlines()[-1]}")
+    viewer_app.exit(1)
+
 
-# Here, we use the lambert shader.
-# This shader requires two things:
-# - A uniform value called 'albedo' for the color of the mesh.
-# - An attribute called 'normal' for the mesh normals.
-uniforms = {}
-vertex_attributes = {}
-face_attributes = {}
-
-uniforms["albedo"] = np.array([0.8, 0.8, 0.8])
-
-# If we want flat shading with normals defined per face.
-# face_normals = igl.per_face_normals(vertices, faces, np.array([1.0, 1.0, 1.0])).astype(
-#     np.float32
-# )
-face_normals = mesh.face_normals.astype(np.float32)
-face_attributes["normal"] = face_normals
-
-# If we want smooth shading with normals defined per vertex.
-# vertex_normals = igl.per_vertex_normals(vertices, faces, igl.PER_VERTEX_NORMALS_WEIGHTING_TYPE_AREA).astype(np.float32)
-# vertex_attributes['normal'] = vertex_normals
-
-mesh_index = viewer_widget.add_mesh(vertices, faces)
-mesh_prefab_index = viewer_widget.add_mesh_prefab(
-    mesh_index,
-    "lambert",
-    vertex_attributes=vertex_attributes,
-    face_attributes=face_attributes,
-    uniforms=uniforms,
-)
-instance_index = viewer_widget.add_mesh_instance(
-    mesh_prefab_index, np.eye(4, dtype="f")
-)
-
-# Add the wireframe for our mesh
-viewer_widget.add_wireframe(instance_index, line_color=np.array([0.1, 0.1, 0.1]))
+# The window shows up while the mesh is parsed, the mesh is added from the GUI thread when it is ready.
+mesh_loader = MeshLoader(path_to_obj_file, viewer)
+mesh_loader.mesh_loaded.connect(on_mesh_loaded)
+mesh_loader.loading_failed.connect(on_loading_failed)
+# Closing the window, including with Escape, can happen before the loading is done.
+viewer.close_signal.connect(mesh_loader.stop)
+viewer_app.aboutToQuit.connect(mesh_loader.stop)
+mesh_loader.start()
 
 # Launch the Qt application
-viewer_app.exec()
+sys.exit(viewer_app.exec())
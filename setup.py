@@ -14,6 +14,7 @@ setup(
     author_email="victor.cornillere@zalando.ch",
     packages=find_packages(),
     install_requires=["PyOpenGL", "PyQt5", "numpy"],
+    extras_require={"numba": ["numba"]},
     include_package_data=True,
     zip_safe=False,
 )